@@ -0,0 +1,651 @@
+import codecs
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import NamedTuple
+
+
+# ================= Styles =================
+
+
+class TextStyle(NamedTuple):
+    # Colors are None (terminal default), a palette index (0-255) or an (r, g, b) tuple
+    fg: object = None
+    bg: object = None
+    bold: bool = False
+    italic: bool = False
+    underline: bool = False
+    inverse: bool = False
+
+
+DEFAULT_STYLE = TextStyle()
+
+
+# ================= ANSI Parser =================
+
+# Event kinds produced by AnsiParser.feed()
+TEXT = 0  # (TEXT, text)
+CONTROL = 1  # (CONTROL, char)
+CSI = 2  # (CSI, private, params, final)
+ESC = 3  # (ESC, char)
+SGR = 4  # (SGR, groups)
+TITLE = 5  # (TITLE, text)
+
+_TOKEN = re.compile(
+    r"(?P<text>[^\x00-\x1f\x7f-\x9f]+)"
+    r"|\x1b\[(?P<private>[<=>?]?)(?P<params>[\x30-\x3f]*)(?P<final>[\x20-\x2f]*[\x40-\x7e])"
+    r"|\x1b\](?P<osc>[^\x07\x1b]*)(?:\x07|\x1b\\)"
+    r"|\x1b[PX^_][^\x07\x1b]*(?:\x07|\x1b\\)"
+    r"|\x1b[()*+#%][\x20-\x7e]"
+    r"|\x1b(?![\[\]PX^_()*+#%])(?P<esc>[\x20-\x7e])"
+    r"|(?P<control>[\x00-\x1a\x1c-\x1f\x7f-\x9f])"
+)
+
+# An escape sequence that is cut off at the end of a chunk and may still complete
+_INCOMPLETE = re.compile(
+    r"\x1b(?:\[[\x30-\x3f]*[\x20-\x2f]*|\][^\x07\x1b]*\x1b?|[PX^_][^\x07\x1b]*\x1b?|[()*+#%])?\Z"
+)
+
+_CONTROLS = "\n\r\b\t\x07\x0b\x0c"
+
+
+class AnsiParser:
+    """Turns raw terminal output into batches of text runs and control events.
+
+    Runs on the terminal reader thread, so it keeps no reference to Qt or to the
+    screen. It is stateless apart from incomplete input: the drawing style is
+    owned by the Screen, which also handles cursor save/restore and resets.
+    """
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.pending = ""
+
+    def feed(self, data):
+        text = self.pending + self.decoder.decode(data)
+        self.pending = ""
+        events = []
+        pos = 0
+        end = len(text)
+
+        while pos < end:
+            match = _TOKEN.match(text, pos)
+            if match is None:
+                # Lone ESC: either wait for the rest of the sequence or drop it
+                if _INCOMPLETE.match(text, pos) and end - pos < 4096:
+                    self.pending = text[pos:]
+                    break
+                pos += 1
+                continue
+            pos = match.end()
+
+            kind = match.lastgroup
+            if kind == "text":
+                events.append((TEXT, match.group("text")))
+            elif kind == "control":
+                char = match.group("control")
+                if char in _CONTROLS:
+                    events.append((CONTROL, char))
+            elif kind == "final":
+                private = match.group("private")
+                final = match.group("final")
+                params = match.group("params")
+                if final == "m" and not private:
+                    events.append((SGR, parse_sgr_params(params)))
+                else:
+                    events.append((CSI, private, parse_params(params), final))
+            elif kind == "osc":
+                command, _, value = match.group("osc").partition(";")
+                if command in ("0", "2"):
+                    events.append((TITLE, value))
+            elif kind == "esc":
+                events.append((ESC, match.group("esc")))
+
+        return events
+
+
+def parse_params(params):
+    result = []
+    for value in params.split(";"):
+        try:
+            result.append(int(value) if value else 0)
+        except ValueError:
+            result.append(0)
+    return result
+
+
+def parse_sgr_params(params):
+    # "38:2::255:0:0;1" -> [[38, 2, 0, 255, 0, 0], [1]], colon groups stay together
+    return [parse_params(group.replace(":", ";")) for group in params.split(";")]
+
+
+def extended_color(values):
+    # values follow the 38/48 code: [5, n] or [2, r, g, b]; returns (color, used)
+    if values and values[0] == 5 and len(values) >= 2:
+        return values[1] & 0xFF, 2
+    if values and values[0] == 2 and len(values) >= 4:
+        return tuple(v & 0xFF for v in values[1:4]), 4
+    return None, 0
+
+
+def select_graphic_rendition(style, groups):
+    i = 0
+    while i < len(groups):
+        code, *sub = groups[i]
+        i += 1
+        if code == 0:
+            style = DEFAULT_STYLE
+        elif code == 1:
+            style = style._replace(bold=True)
+        elif code == 3:
+            style = style._replace(italic=True)
+        elif code == 4:
+            # 4:0 turns underline off, 4:1..4:5 are underline variants
+            style = style._replace(underline=not sub or sub[0] != 0)
+        elif code == 7:
+            style = style._replace(inverse=True)
+        elif code == 22:
+            style = style._replace(bold=False)
+        elif code == 23:
+            style = style._replace(italic=False)
+        elif code == 24:
+            style = style._replace(underline=False)
+        elif code == 27:
+            style = style._replace(inverse=False)
+        elif 30 <= code <= 37:
+            style = style._replace(fg=code - 30)
+        elif code == 39:
+            style = style._replace(fg=None)
+        elif 40 <= code <= 47:
+            style = style._replace(bg=code - 40)
+        elif code == 49:
+            style = style._replace(bg=None)
+        elif 90 <= code <= 97:
+            style = style._replace(fg=code - 90 + 8)
+        elif 100 <= code <= 107:
+            style = style._replace(bg=code - 100 + 8)
+        elif code in (38, 48):
+            if sub:
+                # Colon form; truecolor may carry a color space id: 38:2:<id>:r:g:b
+                if sub[0] == 2 and len(sub) >= 5:
+                    sub = [2] + sub[-3:]
+                color, _ = extended_color(sub)
+            else:
+                color, used = extended_color([group[0] for group in groups[i : i + 4]])
+                if not used:
+                    break
+                i += used
+            if color is None:
+                continue
+            if code == 38:
+                style = style._replace(fg=color)
+            else:
+                style = style._replace(bg=color)
+    return style
+
+
+@lru_cache(maxsize=4096)
+def char_width(char):
+    """Number of cells a character takes: 0 for combining marks, 2 for wide CJK/emoji."""
+    if unicodedata.combining(char) or unicodedata.category(char) in ("Mn", "Me", "Cf"):
+        return 0
+    if unicodedata.east_asian_width(char) in ("W", "F"):
+        return 2
+    return 1
+
+
+# ================= Screen Model =================
+
+# Content of the right half of a wide character's two cells
+WIDE_PLACEHOLDER = ""
+
+
+class Line:
+    __slots__ = ("chars", "styles")
+
+    def __init__(self, cols, style=DEFAULT_STYLE):
+        self.chars = [" "] * cols
+        self.styles = [style] * cols
+
+    def resize(self, cols):
+        missing = cols - len(self.chars)
+        if missing > 0:
+            self.chars.extend([" "] * missing)
+            self.styles.extend([DEFAULT_STYLE] * missing)
+        elif missing < 0:
+            del self.chars[cols:]
+            del self.styles[cols:]
+
+    def erase(self, start, stop, style):
+        self.chars[start:stop] = [" "] * (stop - start)
+        self.styles[start:stop] = [style] * (stop - start)
+
+
+class Screen:
+    """Cell grid the terminal view paints from.
+
+    Applies the event batches produced by AnsiParser and remembers which rows
+    changed, so the view only repaints those rows.
+    """
+
+    def __init__(self, rows=24, cols=80, scrollback=5000):
+        self.rows = rows
+        self.cols = cols
+        self.scrollback = deque(maxlen=scrollback)
+        self.dirty = set()
+        self.title = ""
+        self.reset()
+
+    def reset(self):
+        self.lines = [Line(self.cols) for _ in range(self.rows)]
+        self.main_lines = None  # Saved main buffer while the alternate screen is active
+        self.style = DEFAULT_STYLE
+        self.cursor_row = 0
+        self.cursor_col = 0
+        self.wrap_pending = False
+        self.saved_cursor = (0, 0, DEFAULT_STYLE)
+        self.top = 0
+        self.bottom = self.rows - 1
+        self.autowrap = True
+        self.cursor_visible = True
+        self.app_cursor_keys = False
+        self.bracketed_paste = False
+        self.last_char = None
+        self.dirty.update(range(self.rows))
+
+    def soft_reset(self):
+        # DECSTR: modes and attributes go back to defaults, the content stays
+        self.style = DEFAULT_STYLE
+        self.wrap_pending = False
+        self.saved_cursor = (0, 0, DEFAULT_STYLE)
+        self.top = 0
+        self.bottom = self.rows - 1
+        self.autowrap = True
+        self.cursor_visible = True
+        self.app_cursor_keys = False
+        self.dirty.add(self.cursor_row)
+
+    @property
+    def alternate(self):
+        return self.main_lines is not None
+
+    def take_dirty(self):
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
+
+    # ---------- Events ----------
+
+    def apply(self, events):
+        """Apply a parser batch; returns the reply to send back to the program, if any."""
+        replies = []
+        for event in events:
+            kind = event[0]
+            if kind == TEXT:
+                self.draw(event[1])
+            elif kind == CONTROL:
+                self.control(event[1])
+            elif kind == SGR:
+                self.style = select_graphic_rendition(self.style, event[1])
+            elif kind == CSI:
+                reply = self.csi(event[1], event[2], event[3])
+                if reply:
+                    replies.append(reply)
+            elif kind == ESC:
+                self.escape(event[1])
+            elif kind == TITLE:
+                self.title = event[1]
+        return "".join(replies)
+
+    def draw(self, text):
+        if text.isascii():
+            self.draw_narrow(text)
+            return
+
+        start = 0
+        for index, char in enumerate(text):
+            width = char_width(char)
+            if width == 1:
+                continue
+            if index > start:
+                self.draw_narrow(text[start:index])
+            if width == 2:
+                self.draw_wide(char)
+            else:
+                self.draw_combining(char)
+            start = index + 1
+        if start < len(text):
+            self.draw_narrow(text[start:])
+
+    def wrap(self):
+        self.wrap_pending = False
+        self.cursor_col = 0
+        self.index()
+
+    def draw_narrow(self, text):
+        style = self.style
+        self.last_char = text[-1]
+        cols = self.cols
+        while text:
+            if self.wrap_pending:
+                if not self.autowrap:
+                    line = self.lines[self.cursor_row]
+                    line.chars[-1] = text[-1]
+                    line.styles[-1] = style
+                    self.dirty.add(self.cursor_row)
+                    return
+                self.wrap()
+
+            row = self.cursor_row
+            col = self.cursor_col
+            count = min(len(text), cols - col)
+            line = self.lines[row]
+            line.chars[col : col + count] = text[:count]
+            line.styles[col : col + count] = [style] * count
+            self.dirty.add(row)
+            text = text[count:]
+
+            if col + count >= cols:
+                self.cursor_col = cols - 1
+                self.wrap_pending = True
+            else:
+                self.cursor_col = col + count
+
+    def draw_wide(self, char):
+        # A wide character takes its cell plus a WIDE_PLACEHOLDER cell to its right
+        if self.cols < 2:
+            self.draw_narrow(char)
+            return
+        self.last_char = char
+        if self.wrap_pending or self.cursor_col + 2 > self.cols:
+            if self.autowrap:
+                self.wrap()
+            else:
+                self.wrap_pending = False
+                self.cursor_col = self.cols - 2
+
+        row = self.cursor_row
+        col = self.cursor_col
+        line = self.lines[row]
+        line.chars[col : col + 2] = [char, WIDE_PLACEHOLDER]
+        line.styles[col : col + 2] = [self.style] * 2
+        self.dirty.add(row)
+
+        if col + 2 >= self.cols:
+            self.cursor_col = self.cols - 1
+            self.wrap_pending = True
+        else:
+            self.cursor_col = col + 2
+
+    def draw_combining(self, char):
+        # Zero-width characters join the cell that was written last
+        col = self.cursor_col if self.wrap_pending else self.cursor_col - 1
+        if col < 0:
+            return
+        line = self.lines[self.cursor_row]
+        if line.chars[col] == WIDE_PLACEHOLDER and col > 0:
+            col -= 1
+        line.chars[col] += char
+        self.dirty.add(self.cursor_row)
+
+    def control(self, char):
+        if char == "\r":
+            self.move_to(self.cursor_row, 0)
+        elif char in "\n\x0b\x0c":
+            self.wrap_pending = False
+            self.index()
+        elif char == "\b":
+            self.move_to(self.cursor_row, self.cursor_col - 1)
+        elif char == "\t":
+            self.move_to(self.cursor_row, (self.cursor_col // 8 + 1) * 8)
+
+    def escape(self, char):
+        if char == "7":
+            self.saved_cursor = (self.cursor_row, self.cursor_col, self.style)
+        elif char == "8":
+            row, col, self.style = self.saved_cursor
+            self.move_to(row, col)
+        elif char == "D":
+            self.index()
+        elif char == "E":
+            self.move_to(self.cursor_row, 0)
+            self.index()
+        elif char == "M":
+            self.reverse_index()
+        elif char == "c":
+            self.reset()
+
+    def csi(self, private, params, final):
+        first = params[0]
+        count = max(1, first)
+        row, col = self.cursor_row, self.cursor_col
+
+        if private == "?":
+            if final in ("h", "l"):
+                self.set_private_mode(params, final == "h")
+            return None
+        if private == ">":
+            if final == "c":
+                return "\x1b[>0;0;0c"
+            return None
+        if private:
+            return None
+
+        if final == "A":
+            self.move_to(max(row - count, self.top if row >= self.top else 0), col)
+        elif final in ("B", "e"):
+            self.move_to(min(row + count, self.bottom if row <= self.bottom else self.rows - 1), col)
+        elif final in ("C", "a"):
+            self.move_to(row, col + count)
+        elif final == "D":
+            self.move_to(row, col - count)
+        elif final == "E":
+            self.move_to(row + count, 0)
+        elif final == "F":
+            self.move_to(row - count, 0)
+        elif final in ("G", "`"):
+            self.move_to(row, count - 1)
+        elif final in ("H", "f"):
+            self.move_to(count - 1, max(1, params[1] if len(params) > 1 else 0) - 1)
+        elif final == "d":
+            self.move_to(count - 1, col)
+        elif final == "J":
+            self.erase_display(first)
+        elif final == "K":
+            self.erase_line(first)
+        elif final == "L":
+            if self.top <= row <= self.bottom:
+                self.scroll_down(count, row)
+        elif final == "M":
+            if self.top <= row <= self.bottom:
+                self.scroll_up(count, row)
+        elif final == "@":
+            self.insert_chars(count)
+        elif final == "P":
+            self.delete_chars(count)
+        elif final == "X":
+            self.lines[row].erase(col, min(self.cols, col + count), self.blank_style())
+            self.dirty.add(row)
+        elif final == "S":
+            self.scroll_up(count, self.top)
+        elif final == "T":
+            self.scroll_down(count, self.top)
+        elif final == "b":
+            if self.last_char:
+                self.draw(self.last_char * min(count, self.rows * self.cols))
+        elif final == "r":
+            top = count - 1
+            bottom = (params[1] if len(params) > 1 and params[1] else self.rows) - 1
+            if top < bottom < self.rows:
+                self.top, self.bottom = top, bottom
+                self.move_to(0, 0)
+        elif final == "s":
+            self.saved_cursor = (row, col, self.style)
+        elif final == "u":
+            row, col, self.style = self.saved_cursor
+            self.move_to(row, col)
+        elif final == "n":
+            if first == 6:
+                return f"\x1b[{row + 1};{col + 1}R"
+            if first == 5:
+                return "\x1b[0n"
+        elif final == "c":
+            return "\x1b[?1;2c"
+        elif final == "!p":
+            self.soft_reset()
+        return None
+
+    def set_private_mode(self, params, enabled):
+        for mode in params:
+            if mode == 1:
+                self.app_cursor_keys = enabled
+            elif mode == 7:
+                self.autowrap = enabled
+            elif mode == 25:
+                self.cursor_visible = enabled
+                self.dirty.add(self.cursor_row)
+            elif mode == 2004:
+                self.bracketed_paste = enabled
+            elif mode in (47, 1047, 1049):
+                if mode == 1049 and enabled:
+                    self.escape("7")
+                self.switch_buffer(enabled)
+                if mode == 1049 and not enabled:
+                    self.escape("8")
+
+    # ---------- Cursor ----------
+
+    def move_to(self, row, col):
+        self.cursor_row = min(max(row, 0), self.rows - 1)
+        self.cursor_col = min(max(col, 0), self.cols - 1)
+        self.wrap_pending = False
+
+    def index(self):
+        if self.cursor_row == self.bottom:
+            self.scroll_up(1, self.top)
+        elif self.cursor_row < self.rows - 1:
+            self.cursor_row += 1
+
+    def reverse_index(self):
+        if self.cursor_row == self.top:
+            self.scroll_down(1, self.top)
+        elif self.cursor_row > 0:
+            self.cursor_row -= 1
+
+    # ---------- Scrolling ----------
+
+    def scroll_up(self, count, top):
+        bottom = self.bottom
+        count = min(count, bottom - top + 1)
+        removed = self.lines[top : top + count]
+        if top == 0 and bottom == self.rows - 1 and not self.alternate:
+            self.scrollback.extend(removed)
+        del self.lines[top : top + count]
+        style = self.blank_style()
+        for _ in range(count):
+            self.lines.insert(bottom - count + 1, Line(self.cols, style))
+        self.dirty.update(range(top, bottom + 1))
+
+    def scroll_down(self, count, top):
+        bottom = self.bottom
+        count = min(count, bottom - top + 1)
+        del self.lines[bottom - count + 1 : bottom + 1]
+        style = self.blank_style()
+        for _ in range(count):
+            self.lines.insert(top, Line(self.cols, style))
+        self.dirty.update(range(top, bottom + 1))
+
+    # ---------- Erasing ----------
+
+    def blank_style(self):
+        # Erased cells keep the current background color, like xterm
+        if self.style.bg is None:
+            return DEFAULT_STYLE
+        return TextStyle(bg=self.style.bg)
+
+    def erase_display(self, mode):
+        style = self.blank_style()
+        row = self.cursor_row
+        if mode == 0:
+            self.erase_line(0)
+            rows = range(row + 1, self.rows)
+        elif mode == 1:
+            self.erase_line(1)
+            rows = range(0, row)
+        else:
+            rows = range(self.rows)
+            if mode == 3:
+                self.scrollback.clear()
+        for index in rows:
+            self.lines[index].erase(0, self.cols, style)
+        self.dirty.update(rows)
+
+    def erase_line(self, mode):
+        line = self.lines[self.cursor_row]
+        if mode == 0:
+            line.erase(self.cursor_col, self.cols, self.blank_style())
+        elif mode == 1:
+            line.erase(0, self.cursor_col + 1, self.blank_style())
+        else:
+            line.erase(0, self.cols, self.blank_style())
+        self.dirty.add(self.cursor_row)
+
+    def insert_chars(self, count):
+        line = self.lines[self.cursor_row]
+        col = self.cursor_col
+        count = min(count, self.cols - col)
+        line.chars[col:col] = [" "] * count
+        line.styles[col:col] = [self.blank_style()] * count
+        line.resize(self.cols)
+        self.dirty.add(self.cursor_row)
+
+    def delete_chars(self, count):
+        line = self.lines[self.cursor_row]
+        col = self.cursor_col
+        count = min(count, self.cols - col)
+        del line.chars[col : col + count]
+        del line.styles[col : col + count]
+        line.chars.extend([" "] * count)
+        line.styles.extend([self.blank_style()] * count)
+        self.dirty.add(self.cursor_row)
+
+    # ---------- Buffers ----------
+
+    def switch_buffer(self, alternate):
+        if alternate == self.alternate:
+            return
+        if alternate:
+            self.main_lines = self.lines
+            self.lines = [Line(self.cols) for _ in range(self.rows)]
+        else:
+            self.lines = self.main_lines
+            self.main_lines = None
+        self.dirty.update(range(self.rows))
+
+    def resize(self, rows, cols):
+        rows = max(1, rows)
+        cols = max(1, cols)
+        if rows == self.rows and cols == self.cols:
+            return
+
+        # Keep the cursor on screen by pushing the top rows into the scrollback
+        shift = max(0, self.cursor_row - (rows - 1))
+        for index, lines in enumerate((self.lines, self.main_lines)):
+            if lines is None:
+                continue
+            if shift:
+                if index == 0 and not self.alternate or index == 1:
+                    self.scrollback.extend(lines[:shift])
+                del lines[:shift]
+            del lines[rows:]
+            for line in lines:
+                line.resize(cols)
+            lines.extend(Line(cols) for _ in range(rows - len(lines)))
+
+        self.rows = rows
+        self.cols = cols
+        self.top = 0
+        self.bottom = rows - 1
+        self.move_to(self.cursor_row - shift, self.cursor_col)
+        self.dirty = set(range(rows))
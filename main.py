@@ -23,12 +23,11 @@ from PySide6.QtGui import (
     QTextFormat,
     QSyntaxHighlighter,
     QTextCharFormat,
-    QTextCursor
-    
 )
-from PySide6.QtCore import Qt, QRect, QSize, QRegularExpression, QProcess
+from PySide6.QtCore import Qt, QRect, QSize, QRegularExpression
 from menubar import create_menubar
-import subprocess
+from terminal import TerminalWidget
+import shlex
 
 
 # ================= Syntax Highlighter =================
@@ -281,63 +280,6 @@ class CodeEditor(QPlainTextEdit):
             super().keyPressEvent(event)
 
 
-# ================= Terminal Widget =================
-
-
-class TerminalWidget(QPlainTextEdit):
-    def __init__(self):
-        super().__init__()
-
-        font = QFont("JetBrains Mono")
-        font.setPointSize(11)
-        self.setFont(font)
-
-        self.setStyleSheet(
-            "background-color: #1a1a1a; color: #d0d0d0; border: none;"
-        )
-
-        self.setMaximumHeight(200)  # Initial height
-
-        self.process = QProcess(self)
-        self.process.readyReadStandardOutput.connect(self.read_output)
-        self.process.readyReadStandardError.connect(self.read_error)
-        self.process.finished.connect(self.process_finished)
-
-        self.start_shell()
-
-    def start_shell(self):
-        self.process.start("zsh", [])  # Or "bash" if preferred
-
-    def read_output(self):
-        output = self.process.readAllStandardOutput().data().decode()
-        self.insertPlainText(output)
-        self.moveCursor(QTextCursor.End)
-
-    def read_error(self):
-        error = self.process.readAllStandardError().data().decode()
-        self.insertPlainText(error)
-        self.moveCursor(QTextCursor.End)
-
-    def process_finished(self):
-        self.insertPlainText("\n[Process finished]\n")
-        self.moveCursor(QTextCursor.End)
-
-    def keyPressEvent(self, event):
-        if event.key() == Qt.Key_Return:
-            # Get the current line
-            cursor = self.textCursor()
-            cursor.movePosition(QTextCursor.End)
-            cursor.select(QTextCursor.LineUnderCursor)
-            command = cursor.selectedText().strip()
-            self.insertPlainText("\n")
-            if command:
-                self.process.write((command + "\n").encode())
-            else:
-                self.process.write("\n".encode())
-        else:
-            super().keyPressEvent(event)
-
-
 # ================= Main Window =================
 
 
@@ -381,6 +323,7 @@ class MainWindow(QMainWindow):
         self.terminal = TerminalWidget()
         self.terminal.hide()  # Initially hidden
         editor_terminal_splitter.addWidget(self.terminal)
+        editor_terminal_splitter.setSizes([750, 250])
 
         splitter.addWidget(self.tree)
         splitter.addWidget(editor_terminal_splitter)
@@ -525,10 +468,16 @@ class MainWindow(QMainWindow):
 
     def open_terminal(self):
         if self.terminal.isHidden():
+            if self.terminal.count() == 0:
+                self.terminal.new_session(self.model.rootPath())
             self.terminal.show()
         else:
             self.terminal.hide()
 
+    def new_terminal(self):
+        self.terminal.show()
+        self.terminal.new_session(self.model.rootPath())
+
     def save_file(self):
         if self.current_file_path:
             try:
@@ -568,18 +517,18 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Run", "Only Python files supported")
             return
         try:
-            result = subprocess.run(
-                [sys.executable, self.current_file_path], capture_output=True, text=True
-            )
-
-            output = result.stdout + result.stderr
+            # Run inside the terminal so colors, input and progress output work
             self.terminal.show()
-            self.terminal.insertPlainText(output + "\n")
-            self.terminal.moveCursor(QTextCursor.End)
-
+            self.terminal.run_command(
+                f"{shlex.quote(sys.executable)} {shlex.quote(self.current_file_path)}"
+            )
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
+    def closeEvent(self, event):
+        self.terminal.close_all()
+        super().closeEvent(event)
+
 
 # ================= Main =================
 
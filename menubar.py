@@ -53,9 +53,14 @@ def create_menubar(window):
     # ---------- Terminal ----------
     new_terminal_action = QAction("New Terminal", window)
     new_terminal_action.triggered.connect(
+        lambda: hasattr(window, "new_terminal") and window.new_terminal()
+    )
+    toggle_terminal_action = QAction("Toggle Terminal", window)
+    toggle_terminal_action.setShortcut("Ctrl+`")
+    toggle_terminal_action.triggered.connect(
         lambda: hasattr(window, "open_terminal") and window.open_terminal()
     )
-    terminal_menu.addAction(new_terminal_action)
+    terminal_menu.addActions([new_terminal_action, toggle_terminal_action])
 
     # ---------- Help ----------
     help_menu.addAction(QAction("Website(Soon)", window))
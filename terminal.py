@@ -0,0 +1,729 @@
+import fcntl
+import os
+import select
+import shutil
+import signal
+import struct
+import termios
+import time
+
+from PySide6.QtWidgets import QApplication, QTabWidget, QWidget, QPushButton
+from PySide6.QtGui import QFont, QColor, QPainter, QFontMetrics
+from PySide6.QtCore import Qt, QEvent, QObject, QRect, QSocketNotifier, QThread, QTimer, Signal
+
+from ansi import AnsiParser, Screen, TEXT, CONTROL, SGR, WIDE_PLACEHOLDER
+
+
+# ================= Colors =================
+
+
+BACKGROUND = QColor("#1a1a1a")
+FOREGROUND = QColor("#d0d0d0")
+CURSOR = QColor("#d0d0d0")
+SELECTION = QColor(0, 122, 204, 110)  # Blue accent, translucent
+
+# Base 16 colors, close to the dark theme used by the editor
+BASE_COLORS = [
+    "#1a1a1a", "#f44747", "#6a9955", "#d7ba7d",
+    "#569cd6", "#c586c0", "#4ec9b0", "#d0d0d0",
+    "#808080", "#f14c4c", "#b5cea8", "#dcdcaa",
+    "#3b8eea", "#d670d6", "#29b8db", "#ffffff",
+]
+
+
+def build_palette():
+    palette = [QColor(color) for color in BASE_COLORS]
+    # 6x6x6 color cube
+    levels = [0, 95, 135, 175, 215, 255]
+    for r in levels:
+        for g in levels:
+            for b in levels:
+                palette.append(QColor(r, g, b))
+    # Grayscale ramp
+    for i in range(24):
+        value = 8 + i * 10
+        palette.append(QColor(value, value, value))
+    return palette
+
+
+PALETTE = build_palette()
+
+
+# ================= PTY Reader =================
+
+
+class PtyReader(QThread):
+    """Reads the PTY and parses the output off the GUI thread.
+
+    Everything that is already waiting on the PTY is read in one go and parsed
+    into a single batch, so a chatty program produces a few large batches
+    instead of one signal per read.
+    """
+
+    batch_ready = Signal(list)
+
+    MAX_BATCH = 256 * 1024
+
+    def __init__(self, fd, parent=None):
+        super().__init__(parent)
+        self.fd = fd
+        self.parser = AnsiParser()
+        self.wake_read, self.wake_write = os.pipe()
+
+    def run(self):
+        while True:
+            readable, _, _ = select.select([self.fd, self.wake_read], [], [])
+            if self.wake_read in readable:
+                break
+
+            data = self.read()
+            if data is None:
+                continue
+            if not data:
+                break
+
+            chunks = [data]
+            size = len(data)
+            while size < self.MAX_BATCH:
+                readable, _, _ = select.select([self.fd], [], [], 0.002)
+                if not readable:
+                    break
+                data = self.read()
+                if not data:
+                    # EOF is seen again by the outer select
+                    break
+                chunks.append(data)
+                size += len(data)
+
+            events = self.parser.feed(b"".join(chunks))
+            if events:
+                self.batch_ready.emit(events)
+
+    def read(self):
+        # None when nothing is available (the fd is non-blocking), b"" at EOF
+        try:
+            return os.read(self.fd, 65536)
+        except BlockingIOError:
+            return None
+        except OSError:
+            # EIO once the shell has exited
+            return b""
+
+    def stop(self):
+        os.write(self.wake_write, b"x")
+        self.wait()
+        os.close(self.wake_read)
+        os.close(self.wake_write)
+
+
+# ================= Terminal Session =================
+
+
+def default_shell():
+    return os.environ.get("SHELL") or shutil.which("zsh") or "/bin/sh"
+
+
+class TerminalSession(QObject):
+    updated = Signal()
+    title_changed = Signal(str)
+
+    def __init__(self, rows=24, cols=80, cwd=None, parent=None):
+        super().__init__(parent)
+        self.screen = Screen(rows, cols)
+        self.is_running = True
+        self.is_closed = False
+        self.reaped = False
+        self.write_buffer = b""
+
+        shell = default_shell()
+        shell_path = shutil.which(shell) or shell
+        cwd = os.path.abspath(cwd) if cwd else None
+        env = dict(os.environ, TERM="xterm-256color", COLORTERM="truecolor")
+
+        # forkpty() sets up the new session and controlling terminal in C. The
+        # reader threads of other sessions (and Qt's own) are running while we
+        # fork, so everything is prepared up front and the child only does the
+        # chdir() and execve() system calls
+        self.pid, self.master_fd = os.forkpty()
+        if self.pid == 0:
+            try:
+                if cwd:
+                    os.chdir(cwd)
+                os.execve(shell_path, [shell], env)
+            finally:
+                os._exit(127)
+        self.set_window_size(rows, cols)
+
+        # Writes never block the GUI thread: what the PTY does not take right
+        # away waits in write_buffer until the notifier reports room
+        os.set_blocking(self.master_fd, False)
+        self.write_notifier = QSocketNotifier(self.master_fd, QSocketNotifier.Write, self)
+        self.write_notifier.setEnabled(False)
+        self.write_notifier.activated.connect(self.flush_writes)
+
+        self.reader = PtyReader(self.master_fd, self)
+        self.reader.batch_ready.connect(self.apply_batch)
+        self.reader.finished.connect(self.process_finished)
+        self.reader.start()
+
+    def apply_batch(self, events):
+        reply = self.screen.apply(events)
+        if reply:
+            self.write(reply)
+        if self.screen.title:
+            self.title_changed.emit(self.screen.title)
+            self.screen.title = ""
+        self.updated.emit()
+
+    def process_finished(self):
+        self.is_running = False
+        self.reap(1.0)
+        if self.is_closed:
+            return
+        self.screen.apply(
+            [(SGR, [[0]]), (CONTROL, "\r"), (CONTROL, "\n"), (TEXT, "[Process finished]")]
+        )
+        self.updated.emit()
+
+    def reap(self, timeout):
+        """Wait up to timeout seconds for the shell to exit; True once it is reaped."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.reaped:
+                return True
+            try:
+                pid, _ = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                pid = self.pid
+            if pid:
+                self.reaped = True
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def shell_is_foreground(self):
+        # False while a program started from the shell (python, htop, vim ...) owns the terminal
+        if not self.is_running or self.is_closed:
+            return False
+        try:
+            return os.tcgetpgrp(self.master_fd) == self.pid
+        except OSError:
+            return False
+
+    def write(self, data):
+        if self.is_closed:
+            return
+        if isinstance(data, str):
+            data = data.encode()
+        self.write_buffer += data
+        self.flush_writes()
+
+    def flush_writes(self):
+        if self.is_closed:
+            return
+        try:
+            while self.write_buffer:
+                written = os.write(self.master_fd, self.write_buffer)
+                self.write_buffer = self.write_buffer[written:]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.write_buffer = b""
+        self.write_notifier.setEnabled(bool(self.write_buffer))
+
+    def set_window_size(self, rows, cols):
+        try:
+            fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+        except OSError:
+            pass
+
+    def resize(self, rows, cols):
+        if (rows, cols) == (self.screen.rows, self.screen.cols):
+            return
+        self.screen.resize(rows, cols)
+        self.set_window_size(rows, cols)
+        self.updated.emit()
+
+    def close(self):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        self.write_notifier.setEnabled(False)
+        self.write_buffer = b""
+        self.kill(signal.SIGHUP)
+        self.reader.stop()
+        os.close(self.master_fd)
+        if not self.reap(0.5):
+            self.kill(signal.SIGKILL)
+            self.reap(1.0)
+
+    def kill(self, sig):
+        # Once reaped, the pid may already belong to an unrelated process
+        if self.reaped:
+            return
+        try:
+            os.killpg(self.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+# ================= Terminal View =================
+
+
+KEY_SEQUENCES = {
+    Qt.Key_Return: "\r",
+    Qt.Key_Enter: "\r",
+    Qt.Key_Backspace: "\x7f",
+    Qt.Key_Tab: "\t",
+    Qt.Key_Backtab: "\x1b[Z",
+    Qt.Key_Escape: "\x1b",
+    Qt.Key_Insert: "\x1b[2~",
+    Qt.Key_Delete: "\x1b[3~",
+    Qt.Key_PageUp: "\x1b[5~",
+    Qt.Key_PageDown: "\x1b[6~",
+    Qt.Key_F1: "\x1bOP",
+    Qt.Key_F2: "\x1bOQ",
+    Qt.Key_F3: "\x1bOR",
+    Qt.Key_F4: "\x1bOS",
+    Qt.Key_F5: "\x1b[15~",
+    Qt.Key_F6: "\x1b[17~",
+    Qt.Key_F7: "\x1b[18~",
+    Qt.Key_F8: "\x1b[19~",
+    Qt.Key_F9: "\x1b[20~",
+    Qt.Key_F10: "\x1b[21~",
+    Qt.Key_F11: "\x1b[23~",
+    Qt.Key_F12: "\x1b[24~",
+}
+
+# Cursor keys: the final byte, sent as CSI or SS3 depending on the cursor key mode
+CURSOR_KEYS = {
+    Qt.Key_Up: "A",
+    Qt.Key_Down: "B",
+    Qt.Key_Right: "C",
+    Qt.Key_Left: "D",
+    Qt.Key_Home: "H",
+    Qt.Key_End: "F",
+}
+
+
+class TerminalView(QWidget):
+    """Paints a TerminalSession's screen and forwards keyboard input to it.
+
+    Repaints are coalesced to one per frame and limited to the rows the screen
+    marked dirty, so heavy output or full-screen programs stay cheap.
+    """
+
+    FRAME_INTERVAL = 16  # ms
+
+    def __init__(self, session, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.screen = session.screen
+        self.scroll_offset = 0
+        self.wheel_delta = 0
+        self.painted_cursor_row = 0
+        # Selection as ((row, col), (row, col)), rows counted from the top of the
+        # scrollback, the end column exclusive
+        self.selection = None
+        self.selection_anchor = None
+
+        font = QFont("JetBrains Mono")
+        font.setPointSize(11)
+        font.setStyleHint(QFont.Monospace)
+        self.setFont(font)
+        self.fonts = {}
+        metrics = QFontMetrics(font)
+        self.cell_width = max(1, metrics.horizontalAdvance("M"))
+        self.cell_height = max(1, metrics.height())
+        self.ascent = metrics.ascent()
+
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setAttribute(Qt.WA_InputMethodEnabled, False)
+
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.setInterval(self.FRAME_INTERVAL)
+        self.repaint_timer.timeout.connect(self.flush_dirty_rows)
+        session.updated.connect(self.schedule_repaint)
+
+    # ---------- Repainting ----------
+
+    def schedule_repaint(self):
+        if not self.repaint_timer.isActive():
+            self.repaint_timer.start()
+
+    def flush_dirty_rows(self):
+        rows = self.screen.take_dirty()
+        if self.screen.alternate:
+            # Full-screen programs have no scrollback to look at
+            self.scroll_to_bottom()
+        self.clamp_scroll_offset()
+        if self.scroll_offset:
+            # Everything moves while looking at the scrollback
+            self.update()
+            return
+
+        rows.add(self.painted_cursor_row)
+        rows.add(self.screen.cursor_row)
+        width = self.width()
+        for row in rows:
+            if row < self.screen.rows:
+                self.update(0, row * self.cell_height, width, self.cell_height)
+
+    def scroll_to_bottom(self):
+        if self.scroll_offset:
+            self.scroll_offset = 0
+            self.update()
+
+    def clamp_scroll_offset(self):
+        # The scrollback can shrink under the view (CSI 3J, e.g. from clear)
+        limit = len(self.screen.scrollback)
+        if self.scroll_offset > limit:
+            self.scroll_offset = limit
+            self.update()
+
+    def absolute_row(self, row):
+        return len(self.screen.scrollback) - self.scroll_offset + row
+
+    def absolute_line(self, index):
+        scrollback = self.screen.scrollback
+        if 0 <= index < len(scrollback):
+            return scrollback[index]
+        index -= len(scrollback)
+        if 0 <= index < self.screen.rows:
+            return self.screen.lines[index]
+        return None
+
+    def line_at(self, row):
+        return self.absolute_line(self.absolute_row(row))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        region = event.region()
+        painter.setClipRegion(region)
+        rect = region.boundingRect()
+        painter.fillRect(rect, BACKGROUND)
+        self.clamp_scroll_offset()
+
+        # The region is usually a few separate rows; skip the ones in between
+        screen = self.screen
+        width = self.width()
+        first = max(0, rect.top() // self.cell_height)
+        last = min(screen.rows - 1, rect.bottom() // self.cell_height)
+        rows = [
+            row
+            for row in range(first, last + 1)
+            if region.intersects(QRect(0, row * self.cell_height, width, self.cell_height))
+        ]
+        for row in rows:
+            line = self.line_at(row)
+            if line is not None:
+                self.paint_line(painter, row, line)
+            self.paint_selection(painter, row)
+
+        cursor_row = screen.cursor_row + self.scroll_offset
+        if screen.cursor_visible and cursor_row in rows and self.hasFocus():
+            painter.fillRect(
+                screen.cursor_col * self.cell_width,
+                cursor_row * self.cell_height,
+                self.cell_width,
+                self.cell_height,
+                CURSOR,
+            )
+            line = self.line_at(cursor_row)
+            if line is not None and screen.cursor_col < len(line.chars):
+                painter.setFont(self.font_for(line.styles[screen.cursor_col]))
+                painter.setPen(BACKGROUND)
+                painter.drawText(
+                    screen.cursor_col * self.cell_width,
+                    cursor_row * self.cell_height + self.ascent,
+                    line.chars[screen.cursor_col],
+                )
+        elif screen.cursor_visible and cursor_row in rows:
+            painter.setPen(CURSOR)
+            painter.drawRect(
+                screen.cursor_col * self.cell_width,
+                cursor_row * self.cell_height,
+                self.cell_width - 1,
+                self.cell_height - 1,
+            )
+        self.painted_cursor_row = screen.cursor_row
+
+    def paint_line(self, painter, row, line):
+        chars = line.chars
+        styles = line.styles
+        count = min(len(chars), self.screen.cols)
+        start = 0
+        for col in range(1, count + 1):
+            if col == count or styles[col] != styles[start]:
+                self.paint_run(painter, row, start, chars[start:col], styles[start])
+                start = col
+
+    def paint_run(self, painter, row, col, chars, style):
+        fg = self.color(style.fg, FOREGROUND)
+        bg = self.color(style.bg, BACKGROUND)
+        if style.inverse:
+            fg, bg = bg, fg
+
+        x = col * self.cell_width
+        y = row * self.cell_height
+        if bg != BACKGROUND:
+            painter.fillRect(x, y, len(chars) * self.cell_width, self.cell_height, bg)
+        text = "".join(chars)
+        if not text.strip() and not style.underline:
+            return
+        painter.setFont(self.font_for(style))
+        painter.setPen(fg)
+        if WIDE_PLACEHOLDER in chars:
+            # Wide glyphs rarely measure exactly two cells, place each one on its cell
+            for offset, char in enumerate(chars):
+                if char:
+                    painter.drawText(x + offset * self.cell_width, y + self.ascent, char)
+        else:
+            painter.drawText(x, y + self.ascent, text)
+
+    def paint_selection(self, painter, row):
+        columns = self.selected_columns(self.absolute_row(row))
+        if columns:
+            start, end = columns
+            painter.fillRect(
+                start * self.cell_width,
+                row * self.cell_height,
+                (end - start) * self.cell_width,
+                self.cell_height,
+                SELECTION,
+            )
+
+    def color(self, value, default):
+        if value is None:
+            return default
+        if isinstance(value, int):
+            return PALETTE[value]
+        return QColor(*value)
+
+    def font_for(self, style):
+        key = (style.bold, style.italic, style.underline)
+        font = self.fonts.get(key)
+        if font is None:
+            font = QFont(self.font())
+            font.setBold(style.bold)
+            font.setItalic(style.italic)
+            font.setUnderline(style.underline)
+            self.fonts[key] = font
+        return font
+
+    # ---------- Geometry ----------
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        rows = max(1, self.height() // self.cell_height)
+        cols = max(1, self.width() // self.cell_width)
+        self.session.resize(rows, cols)
+        self.clamp_scroll_offset()
+        self.update()
+
+    def wheelEvent(self, event):
+        if self.screen.alternate:
+            return
+        # Touchpads send many small deltas; scroll once they add up to a line
+        self.wheel_delta += event.angleDelta().y()
+        lines = int(self.wheel_delta / 40)
+        self.wheel_delta -= lines * 40
+        offset = min(max(self.scroll_offset + lines, 0), len(self.screen.scrollback))
+        if offset != self.scroll_offset:
+            self.scroll_offset = offset
+            self.update()
+
+    # ---------- Selection ----------
+
+    def cell_at(self, pos):
+        row = min(max(pos.y() // self.cell_height, 0), self.screen.rows - 1)
+        col = min(max(round(pos.x() / self.cell_width), 0), self.screen.cols)
+        return (self.absolute_row(row), col)
+
+    def selected_columns(self, index):
+        if self.selection is None:
+            return None
+        (start_row, start_col), (end_row, end_col) = self.selection
+        if not start_row <= index <= end_row:
+            return None
+        start = start_col if index == start_row else 0
+        end = end_col if index == end_row else self.screen.cols
+        return (start, end) if end > start else None
+
+    def selected_text(self):
+        if self.selection is None:
+            return ""
+        lines = []
+        for index in range(self.selection[0][0], self.selection[1][0] + 1):
+            line = self.absolute_line(index)
+            columns = self.selected_columns(index)
+            if line is None or columns is None:
+                lines.append("")
+                continue
+            lines.append("".join(line.chars[columns[0] : columns[1]]).rstrip())
+        return "\n".join(lines)
+
+    def clear_selection(self):
+        if self.selection is not None:
+            self.selection = None
+            self.update()
+
+    def copy(self):
+        text = self.selected_text()
+        if text:
+            QApplication.clipboard().setText(text)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.selection_anchor = self.cell_at(event.position().toPoint())
+            self.clear_selection()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton and self.selection_anchor is not None:
+            start, end = sorted((self.selection_anchor, self.cell_at(event.position().toPoint())))
+            self.selection = (start, end) if start != end else None
+            self.update()
+
+    # ---------- Keyboard ----------
+
+    def event(self, event):
+        if event.type() == QEvent.ShortcutOverride and self.handles_shortcut(event):
+            event.accept()
+            return True
+        return super().event(event)
+
+    def handles_shortcut(self, event):
+        # Ctrl+C, Ctrl+Z ... belong to the shell; Ctrl+` and the other
+        # Ctrl+Shift shortcuts stay with the editor
+        key = event.key()
+        modifiers = event.modifiers()
+        if not modifiers & Qt.ControlModifier or key == Qt.Key_QuoteLeft:
+            return False
+        if modifiers & Qt.ShiftModifier:
+            return key in (Qt.Key_C, Qt.Key_V)
+        return True
+
+    def focusNextPrevChild(self, next):
+        # Tab belongs to the shell (completion), not to focus navigation
+        return False
+
+    def focusInEvent(self, event):
+        super().focusInEvent(event)
+        self.update()
+
+    def focusOutEvent(self, event):
+        super().focusOutEvent(event)
+        self.update()
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        modifiers = event.modifiers()
+
+        if modifiers & Qt.ControlModifier and modifiers & Qt.ShiftModifier:
+            if key == Qt.Key_C:
+                self.copy()
+                return
+            if key == Qt.Key_V:
+                self.paste()
+                return
+
+        if key in CURSOR_KEYS:
+            prefix = "\x1bO" if self.screen.app_cursor_keys else "\x1b["
+            data = prefix + CURSOR_KEYS[key]
+        elif key in KEY_SEQUENCES:
+            data = KEY_SEQUENCES[key]
+        elif modifiers & Qt.ControlModifier and Qt.Key_A <= key <= Qt.Key_BracketRight:
+            # Ctrl+A .. Ctrl+Z, Ctrl+[ Ctrl+\ Ctrl+]
+            data = chr(key - Qt.Key_A + 1)
+        else:
+            data = event.text()
+
+        if not data:
+            super().keyPressEvent(event)
+            return
+        if modifiers & Qt.AltModifier:
+            data = "\x1b" + data
+
+        self.scroll_to_bottom()
+        self.clear_selection()
+        self.session.write(data)
+
+    def paste(self):
+        text = QApplication.clipboard().text()
+        if not text:
+            return
+        text = text.replace("\r\n", "\r").replace("\n", "\r")
+        if self.screen.bracketed_paste:
+            # No ESC inside the brackets, or a pasted "\x1b[201~" would end the
+            # paste early and run the rest as typed input
+            text = "\x1b[200~" + text.replace("\x1b", "") + "\x1b[201~"
+        self.scroll_to_bottom()
+        self.session.write(text)
+
+
+# ================= Terminal Widget =================
+
+
+class TerminalWidget(QTabWidget):
+    def __init__(self):
+        super().__init__()
+
+        self.setTabsClosable(True)
+        self.setMovable(True)
+        self.setDocumentMode(True)
+        self.setElideMode(Qt.ElideRight)
+        self.setStyleSheet(
+            "QTabWidget::pane { background-color: #1a1a1a; border: none; }"
+            "QTabBar::tab { background-color: #1a1a1a; color: #888888; padding: 4px 12px; }"
+            "QTabBar::tab:selected { color: #d0d0d0; border-bottom: 1px solid #007acc; }"
+        )
+        self.tabCloseRequested.connect(self.close_session)
+
+        new_button = QPushButton("+")
+        new_button.setStyleSheet(
+            "QPushButton { background-color: transparent; color: #d0d0d0; padding: 2px 8px; border: none; }"
+            "QPushButton:hover { background-color: #2a2a2a; }"
+        )
+        new_button.setToolTip("New Terminal")
+        new_button.clicked.connect(lambda: self.new_session())
+        self.setCornerWidget(new_button, Qt.TopRightCorner)
+
+        self.session_count = 0
+        self.new_session()
+
+    def new_session(self, cwd=None):
+        session = TerminalSession(cwd=cwd, parent=self)
+        view = TerminalView(session)
+        self.session_count += 1
+        index = self.addTab(view, f"Terminal {self.session_count}")
+        session.title_changed.connect(lambda title: self.setTabText(self.indexOf(view), title))
+        self.setCurrentIndex(index)
+        view.setFocus()
+        return view
+
+    def run_command(self, command):
+        # Only type into a shell prompt, never into a running python, htop or vim
+        view = self.currentWidget()
+        if view is None or not view.session.shell_is_foreground():
+            view = self.new_session()
+        # Ctrl+U first, so a half-typed line does not end up in front of the command
+        view.session.write("\x15" + command + "\r")
+        view.scroll_to_bottom()
+        view.setFocus()
+
+    def close_session(self, index):
+        view = self.widget(index)
+        self.removeTab(index)
+        view.session.close()
+        view.session.deleteLater()
+        view.deleteLater()
+        if self.count() == 0:
+            self.hide()
+
+    def close_all(self):
+        while self.count():
+            self.close_session(0)
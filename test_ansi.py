@@ -0,0 +1,148 @@
+import unittest
+
+from ansi import AnsiParser, Screen, TextStyle, DEFAULT_STYLE, WIDE_PLACEHOLDER
+
+
+def make_screen(rows=5, cols=10):
+    return AnsiParser(), Screen(rows, cols)
+
+
+def feed(parser, screen, data):
+    return screen.apply(parser.feed(data))
+
+
+def row_text(screen, row):
+    return "".join(screen.lines[row].chars).rstrip()
+
+
+class ParserTest(unittest.TestCase):
+    def test_escape_split_across_chunks(self):
+        parser, screen = make_screen()
+        feed(parser, screen, b"ab\x1b[")
+        self.assertEqual(parser.pending, "\x1b[")
+        feed(parser, screen, b"31")
+        feed(parser, screen, b"mcd")
+        self.assertEqual(row_text(screen, 0), "abcd")
+        self.assertEqual(screen.lines[0].styles[2].fg, 1)
+        self.assertEqual(screen.lines[0].styles[1], DEFAULT_STYLE)
+
+    def test_utf8_split_across_chunks(self):
+        parser, screen = make_screen()
+        data = "é".encode()
+        feed(parser, screen, data[:1])
+        feed(parser, screen, data[1:])
+        self.assertEqual(row_text(screen, 0), "é")
+
+    def test_title(self):
+        parser, screen = make_screen()
+        feed(parser, screen, b"\x1b]0;my title\x07")
+        self.assertEqual(screen.title, "my title")
+
+    def test_cursor_position_report(self):
+        parser, screen = make_screen()
+        self.assertEqual(feed(parser, screen, b"\x1b[3;4H\x1b[6n"), "\x1b[3;4R")
+
+
+class GraphicRenditionTest(unittest.TestCase):
+    def style_after(self, data):
+        parser, screen = make_screen()
+        feed(parser, screen, data + b"x")
+        return screen.lines[0].styles[0]
+
+    def test_semicolon_colors(self):
+        style = self.style_after(b"\x1b[1;38;5;200;48;2;1;2;3m")
+        self.assertEqual(style, TextStyle(fg=200, bg=(1, 2, 3), bold=True))
+
+    def test_colon_truecolor_with_color_space(self):
+        self.assertEqual(self.style_after(b"\x1b[38:2::255:0:0m").fg, (255, 0, 0))
+
+    def test_colon_truecolor_without_color_space(self):
+        self.assertEqual(self.style_after(b"\x1b[48:2:0:128:255m").bg, (0, 128, 255))
+
+    def test_colon_underline_style(self):
+        self.assertEqual(self.style_after(b"\x1b[4:3m"), TextStyle(underline=True))
+        self.assertEqual(self.style_after(b"\x1b[4m\x1b[4:0m"), DEFAULT_STYLE)
+
+
+class ScreenTest(unittest.TestCase):
+    def test_autowrap(self):
+        parser, screen = make_screen(cols=4)
+        feed(parser, screen, b"abcdef")
+        self.assertEqual(row_text(screen, 0), "abcd")
+        self.assertEqual(row_text(screen, 1), "ef")
+
+    def test_restore_cursor_restores_style(self):
+        parser, screen = make_screen()
+        feed(parser, screen, b"\x1b7\x1b[31mred\x1b8ok")
+        self.assertEqual(row_text(screen, 0), "okd")
+        self.assertEqual(screen.lines[0].styles[0], DEFAULT_STYLE)
+        self.assertEqual(screen.lines[0].styles[2].fg, 1)
+
+    def test_csi_save_restore_cursor(self):
+        parser, screen = make_screen()
+        feed(parser, screen, b"\x1b[2;3H\x1b[s\x1b[32m\x1b[5;5Hx\x1b[uy")
+        self.assertEqual(row_text(screen, 1), "  y")
+        self.assertEqual(screen.lines[1].styles[2], DEFAULT_STYLE)
+
+    def test_soft_reset(self):
+        parser, screen = make_screen()
+        feed(parser, screen, b"\x1b[31m\x1b[?7l\x1b[!px")
+        self.assertEqual(screen.lines[0].styles[0], DEFAULT_STYLE)
+        self.assertTrue(screen.autowrap)
+
+    def test_alternate_screen(self):
+        parser, screen = make_screen()
+        feed(parser, screen, b"main\x1b[?1049h\x1b[2J\x1b[1;1Halt\x1b[31m")
+        self.assertTrue(screen.alternate)
+        self.assertEqual(row_text(screen, 0), "alt")
+        feed(parser, screen, b"\x1b[?1049lx")
+        self.assertFalse(screen.alternate)
+        self.assertEqual(row_text(screen, 0), "mainx")
+        self.assertEqual(screen.lines[0].styles[4], DEFAULT_STYLE)
+
+    def test_scroll_region(self):
+        parser, screen = make_screen(rows=5)
+        feed(parser, screen, b"1\r\n2\r\n3\r\n4\r\n5\x1b[2;4r\x1b[4;1H\n")
+        self.assertEqual([row_text(screen, row) for row in range(5)], ["1", "3", "4", "", "5"])
+
+    def test_partial_scroll_region_keeps_scrollback(self):
+        parser, screen = make_screen(rows=5)
+        feed(parser, screen, b"\x1b[1;3r" + b"\n" * 6)
+        self.assertEqual(len(screen.scrollback), 0)
+
+    def test_full_screen_scroll_fills_scrollback(self):
+        parser, screen = make_screen(rows=3)
+        feed(parser, screen, b"a\r\nb\r\nc\r\nd")
+        self.assertEqual(["".join(line.chars).rstrip() for line in screen.scrollback], ["a"])
+
+    def test_wide_characters(self):
+        parser, screen = make_screen()
+        feed(parser, screen, "你好x".encode())
+        self.assertEqual(screen.lines[0].chars[:5], ["你", WIDE_PLACEHOLDER, "好", WIDE_PLACEHOLDER, "x"])
+        self.assertEqual(screen.cursor_col, 5)
+
+    def test_wide_character_wraps_at_last_column(self):
+        parser, screen = make_screen(cols=3)
+        feed(parser, screen, "ab你".encode())
+        self.assertEqual(row_text(screen, 0), "ab")
+        self.assertEqual(screen.lines[1].chars[:2], ["你", WIDE_PLACEHOLDER])
+
+    def test_resize_keeps_cursor_on_screen(self):
+        parser, screen = make_screen(rows=5, cols=10)
+        feed(parser, screen, b"1\r\n2\r\n3\r\n4\r\n5")
+        screen.resize(3, 4)
+        self.assertEqual((screen.rows, screen.cols), (3, 4))
+        self.assertEqual([row_text(screen, row) for row in range(3)], ["3", "4", "5"])
+        self.assertEqual((screen.cursor_row, screen.cursor_col), (2, 1))
+        self.assertEqual(len(screen.scrollback), 2)
+        self.assertTrue(all(len(line.chars) == 4 for line in screen.lines))
+
+    def test_dirty_rows(self):
+        parser, screen = make_screen()
+        screen.take_dirty()
+        feed(parser, screen, b"\x1b[3;1Hx")
+        self.assertEqual(screen.take_dirty(), {2})
+
+
+if __name__ == "__main__":
+    unittest.main()